@@ -2,8 +2,13 @@
 import json
 import logging
 import asyncio
+import itertools
+import os
+import sys
+import threading
+import uuid
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 
@@ -39,25 +44,110 @@ BASE = Path(__file__).resolve().parent
 REQUEST_DIR = BASE / "shared-data" / "model_requests"
 REQUEST_DIR.mkdir(parents=True, exist_ok=True)
 
+
+def _next_request_number() -> int:
+    """Scan REQUEST_DIR once and return the number after the highest request_<n>.json."""
+    highest = 0
+    with os.scandir(REQUEST_DIR) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith("request_") and name.endswith(".json"):
+                suffix = name[len("request_"):-len(".json")]
+                if suffix.isdigit():
+                    highest = max(highest, int(suffix))
+    return highest + 1
+
+
+# Candidate ids come from an in-memory counter seeded at import, so saving a
+# request never has to re-scan the directory. Every job runs in its own
+# process with its own counter, so an id is only ours once _save_new_request
+# has linked its file into place; on a clash we move on to the next number.
+_request_counter = itertools.count(_next_request_number())
+_request_counter_lock = threading.Lock()
+
+# -------------------------------------------------------------------------
+# Serialization
+# -------------------------------------------------------------------------
+# Built once: json.dumps constructs a fresh JSONEncoder whenever non-default
+# options such as indent are passed.
+_json_encode = json.JSONEncoder(indent=2, ensure_ascii=False).encode
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize obj to indented UTF-8 JSON."""
+    return _json_encode(obj).encode("utf-8")
+
+
+def _write_temp(directory: Path, data: bytes) -> Path:
+    """Write data to a new hidden temp file in directory and return its path.
+
+    The file is created with mode 0o666 so the process umask applies exactly
+    as it would for a plain open(..., "w").
+    """
+    tmp = directory / f".{uuid.uuid4().hex}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        try:
+            f = os.fdopen(fd, "wb")
+        except BaseException:
+            os.close(fd)
+            raise
+        with f:
+            f.write(data)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    """Atomically replace path with data; readers never see a partial file."""
+    tmp = _write_temp(path.parent, data)
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _save_new_request(fields: Dict[str, Any]) -> str:
+    """Save fields under the next free request_<n> id and return that id.
+
+    The complete file is written to a temp file and hard-linked into place.
+    os.link fails if the name already exists, so claiming the id and
+    publishing the finished JSON are a single atomic step.
+    """
+    with _request_counter_lock:
+        while True:
+            req_id = f"request_{next(_request_counter)}"
+            tmp = _write_temp(REQUEST_DIR, _dumps({"request_id": req_id, **fields}))
+            try:
+                os.link(tmp, REQUEST_DIR / f"{req_id}.json")
+            except FileExistsError:
+                continue
+            finally:
+                os.unlink(tmp)
+            return req_id
+
 # -------------------------------------------------------------------------
 # State model
 # -------------------------------------------------------------------------
-@dataclass
+# dataclass(slots=True) needs Python 3.10+; the project still supports 3.9.
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class RequestState:
     request_id: Optional[str] = None
     description: Optional[str] = None
     model_type: Optional[str] = None
     dimensions: Optional[str] = None
     material: Optional[str] = None
-    extras: Dict[str, Any] = None
+    extras: Dict[str, Any] = field(default_factory=dict)
     waiting_for: Optional[str] = None
 
-    def __post_init__(self):
-        if self.extras is None:
-            self.extras = {}
-
+@dataclass(**_SLOTS)
 class UD:
-    pass
+    req: RequestState
 
 # -------------------------------------------------------------------------
 # Tools
@@ -72,7 +162,9 @@ async def record_initial_request(ctx: RunContext, text: str) -> str:
 @function_tool
 async def record_model_type(ctx: RunContext, model_type: str) -> str:
     ud: UD = ctx.userdata
-    ud.req.model_type = model_type.strip()
+    # Few distinct model types/materials recur across sessions; intern them
+    # so repeated tool calls share one string instead of allocating anew.
+    ud.req.model_type = sys.intern(model_type.strip())
     ud.req.waiting_for = "dimensions"
     return "Understood. What dimensions should the model have?"
 
@@ -86,7 +178,7 @@ async def record_dimensions(ctx: RunContext, dimensions: str) -> str:
 @function_tool
 async def record_material(ctx: RunContext, material: str) -> str:
     ud: UD = ctx.userdata
-    ud.req.material = material.strip()
+    ud.req.material = sys.intern(material.strip())
     ud.req.waiting_for = None
     return "Noted. Any extra details?"
 
@@ -100,25 +192,26 @@ async def record_extra(ctx: RunContext, key: str, value: str) -> str:
 async def save_request(ctx: RunContext) -> str:
     ud: UD = ctx.userdata
     req = ud.req
-    req_id = req.request_id or f"request_{len(list(REQUEST_DIR.glob('*.json'))) + 1}"
-    req.request_id = req_id
-    with open(REQUEST_DIR / f"{req_id}.json", "w", encoding="utf-8") as f:
-        json.dump({
-            "request_id": req.request_id,
-            "description": req.description,
-            "model_type": req.model_type,
-            "dimensions": req.dimensions,
-            "material": req.material,
-            "extras": req.extras
-        }, f, indent=2)
-    return f"Saved your request as {req_id}!"
+    fields = {
+        "description": req.description,
+        "model_type": req.model_type,
+        "dimensions": req.dimensions,
+        "material": req.material,
+        "extras": dict(req.extras),
+    }
+    # Blocking file I/O runs in a worker thread so it never stalls the
+    # event loop that drives the realtime voice pipeline.
+    if req.request_id is None:
+        req.request_id = await asyncio.to_thread(_save_new_request, fields)
+    else:
+        payload = _dumps({"request_id": req.request_id, **fields})
+        await asyncio.to_thread(_write_bytes, REQUEST_DIR / f"{req.request_id}.json", payload)
+    return f"Saved your request as {req.request_id}!"
 
 # -------------------------------------------------------------------------
 # Agent
 # -------------------------------------------------------------------------
-class ModelRequestAgent(Agent):
-    def __init__(self):
-        instructions = """
+_INSTRUCTIONS = """
 You are an AI assistant that collects 3D model requirements.
 
 Conversation flow:
@@ -130,8 +223,11 @@ Conversation flow:
 Always end with a question so the user continues speaking.
 Keep responses short and friendly.
 """
+
+class ModelRequestAgent(Agent):
+    def __init__(self):
         super().__init__(
-            instructions=instructions,
+            instructions=_INSTRUCTIONS,
             tools=[
                 record_initial_request,
                 record_model_type,
@@ -153,6 +249,11 @@ def prewarm(proc: JobProcess):
         proc.userdata["vad"] = None
         logger.warning("Could not load Silero VAD in prewarm, continuing without VAD: %s", e)
 
+_GEMINI_ROLE_ERROR_SIGNATURES = (
+    "Please ensure that single turn requests end with a user role",
+    "INVALID_ARGUMENT",
+)
+
 async def _try_session_run(session: AgentSession):
     """
     Try to run the session using the following strategy:
@@ -171,10 +272,10 @@ async def _try_session_run(session: AgentSession):
     except TypeError as te:
         logger.debug("session.run(user_input='') TypeError (signature mismatch): %s", te)
     except Exception as e:
+        logger.debug("session.run(user_input='') raised: %s", e)
         # Check if it's a Gemini/GenAI client error complaining about roles (400).
         msg = str(e)
-        logger.debug("session.run(user_input='') raised: %s", msg)
-        if "Please ensure that single turn requests end with a user role" in msg or "INVALID_ARGUMENT" in msg:
+        if any(sig in msg for sig in _GEMINI_ROLE_ERROR_SIGNATURES):
             logger.warning("Gemini single-turn role error detected; will retry without user_input.")
         else:
             # If it's some other error, log and still attempt fallback
@@ -194,8 +295,7 @@ async def _try_session_run(session: AgentSession):
 # Entrypoint
 # -------------------------------------------------------------------------
 async def entrypoint(ctx: JobContext):
-    ud = UD()
-    ud.req = RequestState(waiting_for="initial")
+    ud = UD(req=RequestState(waiting_for="initial"))
 
     session = AgentSession(
         stt=deepgram.STT(model="nova-3"),
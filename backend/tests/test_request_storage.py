@@ -0,0 +1,144 @@
+import itertools
+import json
+
+import pytest
+
+import agent
+
+
+@pytest.fixture
+def request_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent, "REQUEST_DIR", tmp_path)
+    return tmp_path
+
+
+def test_next_request_number_skips_non_numeric_names(request_dir) -> None:
+    """Only request_<digits>.json files count towards the next id."""
+    for name in (
+        "request_2.json",
+        "request_10.json",
+        "request_abc.json",
+        "request_99.json.tmp",
+        "request_.json",
+        "other_50.json",
+    ):
+        (request_dir / name).write_text("{}")
+
+    assert agent._next_request_number() == 11
+
+
+def test_next_request_number_empty_dir(request_dir) -> None:
+    assert agent._next_request_number() == 1
+
+
+def test_save_new_request_skips_ids_taken_on_disk(request_dir, monkeypatch) -> None:
+    """A stale counter moves past files another process has already saved."""
+    monkeypatch.setattr(agent, "_request_counter", itertools.count(1))
+    (request_dir / "request_1.json").write_text("{}")
+    (request_dir / "request_2.json").write_text("{}")
+
+    assert agent._save_new_request({"description": "banana"}) == "request_3"
+    assert (request_dir / "request_1.json").read_text() == "{}"
+    assert json.loads((request_dir / "request_3.json").read_bytes()) == {
+        "request_id": "request_3",
+        "description": "banana",
+    }
+    assert sorted(p.name for p in request_dir.iterdir()) == [
+        "request_1.json",
+        "request_2.json",
+        "request_3.json",
+    ]
+
+
+def test_request_ids_unique_across_process_counters(request_dir, monkeypatch) -> None:
+    """Processes seeded from the same directory never overwrite each other's saves."""
+    first = itertools.count(agent._next_request_number())
+    second = itertools.count(agent._next_request_number())
+
+    saved = {}
+    for counter, worker in ((first, "a"), (second, "b"), (first, "a2")):
+        monkeypatch.setattr(agent, "_request_counter", counter)
+        saved[agent._save_new_request({"description": worker})] = worker
+
+    assert set(saved) == {"request_1", "request_2", "request_3"}
+    for req_id, worker in saved.items():
+        assert json.loads((request_dir / f"{req_id}.json").read_bytes())["description"] == worker
+
+
+def test_save_new_request_leaves_nothing_when_publish_fails(request_dir, monkeypatch) -> None:
+    """No empty placeholder or temp file survives a failed save."""
+
+    def fail_link(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(agent.os, "link", fail_link)
+
+    with pytest.raises(OSError, match="disk full"):
+        agent._save_new_request({"description": "banana"})
+
+    assert list(request_dir.iterdir()) == []
+
+
+def test_write_bytes_replaces_existing_file(request_dir) -> None:
+    path = request_dir / "request_1.json"
+    path.write_bytes(b"{}")
+    payload = agent._dumps({"request_id": path.stem, "extras": {}})
+
+    agent._write_bytes(path, payload)
+
+    assert path.read_bytes() == payload
+    reference = request_dir / "reference.txt"
+    reference.write_bytes(b"")
+    assert path.stat().st_mode & 0o777 == reference.stat().st_mode & 0o777
+    reference.unlink()
+    assert [p.name for p in request_dir.iterdir()] == [path.name]
+
+
+def test_write_bytes_cleans_up_temp_file_on_failure(request_dir, monkeypatch) -> None:
+    """A failed rename leaves neither a temp file nor a changed target behind."""
+    path = request_dir / "request_1.json"
+    path.write_bytes(b"{}")
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(agent.os, "replace", fail_replace)
+
+    with pytest.raises(OSError, match="disk full"):
+        agent._write_bytes(path, b'{"request_id": "request_1"}')
+
+    assert [p.name for p in request_dir.iterdir()] == ["request_1.json"]
+    assert path.read_bytes() == b"{}"
+
+
+def test_write_bytes_closes_fd_when_fdopen_fails(request_dir, monkeypatch) -> None:
+    closed = []
+    real_close = agent.os.close
+
+    def fail_fdopen(fd, *args, **kwargs):
+        raise OSError("fdopen failed")
+
+    def track_close(fd):
+        closed.append(fd)
+        real_close(fd)
+
+    monkeypatch.setattr(agent.os, "fdopen", fail_fdopen)
+    monkeypatch.setattr(agent.os, "close", track_close)
+
+    with pytest.raises(OSError, match="fdopen failed"):
+        agent._write_bytes(request_dir / "request_1.json", b"{}")
+
+    assert len(closed) == 1
+    assert list(request_dir.iterdir()) == []
+
+
+def test_dumps_writes_indented_utf8() -> None:
+    data = agent._dumps({"request_id": "request_1", "material": "café", "extras": {}})
+
+    assert data == (
+        b'{\n'
+        b'  "request_id": "request_1",\n'
+        b'  "material": "caf\xc3\xa9",\n'
+        b'  "extras": {}\n'
+        b'}'
+    )